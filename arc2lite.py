@@ -1,7 +1,10 @@
 import argparse
+import concurrent.futures
 import csv
 import datetime
+import io
 import os
+import re
 import sqlite3
 import struct
 import time
@@ -24,10 +27,126 @@ splitter = '\\'
 count = 0
 files_found = []
 
+# Bytes read from the head of each entry when sniffing content signatures
+SIGNATURE_READ_SIZE = 4096
+
+# Container formats built on ZIP, all of which legitimately start with a ZIP header
+ZIP_EXTENSIONS = (
+    '.zip', '.zipx',
+    # Java / Android / iOS packages
+    '.jar', '.war', '.ear', '.apk', '.aab', '.aar', '.ipa',
+    # Office Open XML
+    '.docx', '.docm', '.dotx', '.dotm', '.xlsx', '.xlsm', '.xlsb', '.xltx', '.xltm', '.xlam',
+    '.pptx', '.pptm', '.potx', '.potm', '.ppsx', '.ppsm', '.ppam', '.vsdx', '.vsdm', '.vstx',
+    # OpenDocument
+    '.odt', '.ods', '.odp', '.odg', '.odf', '.odb', '.ott', '.ots', '.otp', '.otg',
+    # Apple iWork
+    '.pages', '.numbers', '.key',
+    # Windows packages and documents
+    '.xps', '.oxps', '.appx', '.appxbundle', '.msix', '.msixbundle', '.vsix', '.nupkg',
+    # Other ZIP containers
+    '.epub', '.xpi', '.crx', '.whl', '.egg', '.kmz', '.3mf', '.cbz', '.sketch', '.fla', '.idml',
+)
+
+# Formats that are PE images under the hood
+PE_EXTENSIONS = (
+    '.exe', '.dll', '.sys', '.scr', '.cpl', '.ocx', '.drv', '.efi', '.com', '.mui',
+    # Type libraries, codecs, resources and other Windows modules
+    '.tlb', '.ax', '.acm', '.tsp', '.rll', '.ime', '.mun', '.winmd', '.msstyles',
+    # Extension modules loaded by other runtimes
+    '.pyd', '.node', '.bpl', '.xll',
+)
+
+# (detected type, offset, magic bytes, extensions expected for that content)
+SIGNATURES = [
+    ('PE/DOS executable', 0, b'MZ', PE_EXTENSIONS),
+    ('ELF executable', 0, b'\x7fELF', ('', '.so', '.o', '.elf', '.bin', '.ko', '.axf')),
+    ('Mach-O executable', 0, b'\xcf\xfa\xed\xfe', ('', '.dylib', '.bundle', '.o')),
+    ('Mach-O executable', 0, b'\xce\xfa\xed\xfe', ('', '.dylib', '.bundle', '.o')),
+    ('Mach-O universal binary', 0, b'\xca\xfe\xba\xbe', ('', '.dylib', '.bundle')),
+    ('Java class', 0, b'\xca\xfe\xba\xbe', ('.class',)),
+    ('DEX executable', 0, b'dex\n', ('.dex',)),
+    ('ZIP archive', 0, b'PK\x03\x04', ZIP_EXTENSIONS),
+    ('ZIP archive', 0, b'PK\x05\x06', ZIP_EXTENSIONS),
+    ('RAR archive', 0, b'Rar!\x1a\x07', ('.rar',)),
+    ('7-Zip archive', 0, b"7z\xbc\xaf'\x1c", ('.7z',)),
+    ('GZIP archive', 0, b'\x1f\x8b', ('.gz', '.tgz', '.gzip')),
+    ('BZIP2 archive', 0, b'BZh', ('.bz2', '.tbz', '.tbz2')),
+    ('XZ archive', 0, b'\xfd7zXZ\x00', ('.xz', '.txz')),
+    ('ZSTD archive', 0, b'\x28\xb5\x2f\xfd', ('.zst', '.zstd')),
+    ('CAB archive', 0, b'MSCF', ('.cab',)),
+    ('TAR archive', 257, b'ustar', ('.tar',)),
+    ('OLE compound file', 0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', ('.doc', '.xls', '.ppt', '.msi', '.msg', '.db', '.pub', '.vsd')),
+    ('PDF document', 0, b'%PDF-', ('.pdf',)),
+    ('RTF document', 0, b'{\\rtf', ('.rtf', '.doc')),
+    ('SQLite database', 0, b'SQLite format 3\x00', ('.db', '.sqlite', '.sqlite3', '.sqlitedb', '.db3', '.storedata', '')),
+    ('Windows shortcut', 0, b'L\x00\x00\x00\x01\x14\x02\x00', ('.lnk',)),
+    # Transaction logs (NTUSER.DAT.LOG1 etc.) start with a copy of the hive's base block
+    ('Windows registry hive', 0, b'regf', ('', '.dat', '.hiv', '.hve', '.log', '.log1', '.log2')),
+    ('Windows event log', 0, b'ElfFile\x00', ('.evtx',)),
+    ('Binary plist', 0, b'bplist', ('.plist', '.bplist', '')),
+    ('JPEG image', 0, b'\xff\xd8\xff', ('.jpg', '.jpeg', '.jpe', '.jfif')),
+    ('PNG image', 0, b'\x89PNG\r\n\x1a\n', ('.png',)),
+    ('GIF image', 0, b'GIF87a', ('.gif',)),
+    ('GIF image', 0, b'GIF89a', ('.gif',)),
+    ('BMP image', 0, b'BM', ('.bmp', '.dib')),
+    ('ICO image', 0, b'\x00\x00\x01\x00', ('.ico',)),
+    ('HEIC image', 4, b'ftypheic', ('.heic', '.heif')),
+    ('MP4 video', 4, b'ftypisom', ('.mp4', '.m4v')),
+    ('MP4 video', 4, b'ftypmp42', ('.mp4', '.m4v')),
+    ('QuickTime video', 4, b'ftypqt', ('.mov', '.qt')),
+    ('MP3 audio', 0, b'ID3', ('.mp3',)),
+    ('Ogg media', 0, b'OggS', ('.ogg', '.oga', '.ogv', '.opus')),
+    ('FLAC audio', 0, b'fLaC', ('.flac',)),
+]
+
+def is_pe_header(head):
+    '''Returns True if an MZ head points at a PE header, or could once the head is too short to hold it'''
+    if len(head) < 64:
+        return False
+    e_lfanew = int.from_bytes(head[0x3c:0x40], 'little')
+    if e_lfanew < 64 or e_lfanew > 0x10000: # Real headers sit just past the DOS stub; text bytes give huge values
+        return False
+    if e_lfanew + 4 <= len(head):
+        return head[e_lfanew:e_lfanew + 4] == b'PE\x00\x00'
+    return len(head) >= SIGNATURE_READ_SIZE # Only trust an offset past the head if the entry is longer than the head
+
+# Structural checks for magics that are shared or too weak to trust on their own
+SIGNATURE_CHECKS = {
+    # MZ must lead to a PE header via e_lfanew at 0x3C
+    'PE/DOS executable': is_pe_header,
+    # Compression method byte is deflate, the only one defined for GZIP
+    'GZIP archive': lambda head: len(head) > 2 and head[2] == 8,
+    # CAFEBABE is followed by the fat arch count (small) or the class file version (major >= 45)
+    'Mach-O universal binary': lambda head: 0 < int.from_bytes(head[4:8], 'big') < 30,
+    'Java class': lambda head: int.from_bytes(head[4:8], 'big') >= 45,
+    # Image count is non-zero and the first directory entry's reserved byte is zero
+    'ICO image': lambda head: len(head) >= 22 and int.from_bytes(head[4:6], 'little') > 0 and head[9] == 0,
+    # DIB header size is one of the known BITMAP*HEADER sizes
+    'BMP image': lambda head: int.from_bytes(head[14:18], 'little') in (12, 16, 40, 52, 56, 64, 108, 124),
+}
+
+# Versioned shared libraries such as libc.so.6 or libssl.so.1.1
+VERSIONED_SO = re.compile(r'\.so(\.\d+)*$', re.IGNORECASE)
+
+# Longest magic first so the most specific match wins
+SIGNATURE_TABLE = [(offset, magic, detected_type, frozenset(extensions), SIGNATURE_CHECKS.get(detected_type))
+                   for detected_type, offset, magic, extensions in sorted(SIGNATURES, key=lambda sig: -len(sig[2]))]
+
 def is_platform_windows():
     '''Returns True if running on Windows'''
     return os.name == 'nt'
 
+def positive_int(value):
+    '''argparse type for options that need a count of at least 1'''
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
 def decode_extended_timestamp(extra_data):
     offset = 0
     length = len(extra_data)
@@ -54,7 +173,55 @@ def decode_extended_timestamp(extra_data):
         else:
             offset += data_size
     return None
-    
+
+def match_signature(head):
+    '''Returns (detected type, expected extensions) for the leading bytes of an entry, or None'''
+    for offset, magic, detected_type, extensions, check in SIGNATURE_TABLE:
+        if head.startswith(magic, offset) and (check is None or check(head)):
+            return detected_type, extensions
+    return None
+
+def signature_extension(entry_path, file_extension):
+    '''Returns the extension to compare against a signature, ignoring version suffixes'''
+    if VERSIONED_SO.search(entry_path):
+        return '.so'
+    file_extension = (file_extension or '').lower()
+    if file_extension[1:].isdigit(): # e.g. python3.11 carries no real extension
+        return ''
+    return file_extension
+
+def sniff_entry(read_head, entry_path, file_extension, source):
+    '''Returns a (detected_type, extension_mismatch, entry_path) row for one entry, or None'''
+    try:
+        head = read_head(source)
+    except Exception: # Encrypted, truncated or unreadable entries are left undetected
+        return None
+    match = match_signature(head)
+    if match is None:
+        return None
+    detected_type, extensions = match
+    extension_mismatch = 0 if signature_extension(entry_path, file_extension) in extensions else 1
+    return (detected_type, extension_mismatch, entry_path)
+
+def sniff_signatures(entries, read_head, workers=None):
+    '''Reads the head of each entry across a thread pool and matches it against the signature table
+
+    entries is a list of (entry_path, file_extension, source) and read_head(source) returns
+    at most SIGNATURE_READ_SIZE bytes. Returns (detected_type, extension_mismatch, entry_path) rows.
+    '''
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        return [row for row in executor.map(lambda entry: sniff_entry(read_head, *entry), entries) if row]
+
+def write_signatures(db_cursor, rows):
+    db_cursor.executemany("UPDATE file_listing SET detected_type = ?, extension_mismatch = ? WHERE entry_path = ?", rows)
+    mismatches = sum(row[1] for row in rows)
+    if mismatches:
+        print(f"Extension mismatches found: {mismatches}")
+
+def read_file_head(file_path):
+    with open(file_path, 'rb') as f:
+        return f.read(SIGNATURE_READ_SIZE)
+
 def process_file(file_path, db_cursor):
     file_name = os.path.basename(file_path)
     file_extension = os.path.splitext(file_name)[1]
@@ -68,8 +235,9 @@ def process_file(file_path, db_cursor):
 
     db_cursor.execute("INSERT OR IGNORE INTO file_listing (file_name, file_extension, entry_path, created_date, modified_date, accessed_date, is_file, size, comp_size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
                 (file_name, file_extension, entry_path, created_date, modified_date, accessed_date, is_file, size, comp_size))
+    return db_cursor.rowcount == 1
 
-def process_zip_file(zip_file_path, out_folder, count):
+def process_zip_file(zip_file_path, out_folder, count, sniff=False, workers=None):
     try:
         db_file_path = os.path.join(out_folder, f"{count}-{os.path.basename(zip_file_path)}_file_listing.db")
         with zipfile.ZipFile(zip_file_path, mode="r") as archive, sqlite3.connect(db_file_path) as conn:
@@ -84,10 +252,13 @@ def process_zip_file(zip_file_path, out_folder, count):
                     accessed_date TEXT,
                     is_file INTEGER,
                     size INTEGER,
-                    comp_size INTEGER
+                    comp_size INTEGER,
+                    detected_type TEXT,
+                    extension_mismatch INTEGER
                 )
             ''')
 
+            sniff_entries = []
             for info in archive.infolist():
                 entry_path = info.filename
                 size = info.file_size
@@ -106,6 +277,18 @@ def process_zip_file(zip_file_path, out_folder, count):
                 cursor.execute("INSERT OR IGNORE INTO file_listing (file_name, file_extension, entry_path, created_date, modified_date, accessed_date, is_file, size, comp_size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
                          (file_name, file_extension, entry_path, created_date, modified_date, accessed_date, is_file, size, comp_size))
 
+                # Only sniff the entry that owns the row; INSERT OR IGNORE keeps the first duplicate
+                if sniff and is_file and size and cursor.rowcount == 1:
+                    sniff_entries.append((entry_path, file_extension, info))
+
+            if sniff_entries:
+                # ZipExtFile only inflates as far as the bytes requested
+                def read_head(info):
+                    with archive.open(info) as member:
+                        return member.read(SIGNATURE_READ_SIZE)
+                print(f"Sniffing content signatures: {len(sniff_entries)} entries")
+                write_signatures(cursor, sniff_signatures(sniff_entries, read_head, workers))
+
         conn.commit()
         return True
     except FileNotFoundError:
@@ -115,7 +298,7 @@ def process_zip_file(zip_file_path, out_folder, count):
         print(f"'{zip_file_path}' is not a valid ZIP file.")
         return False
 
-def process_tar_file(tar_file_path, out_folder, count):
+def process_tar_file(tar_file_path, out_folder, count, sniff=False, workers=None):
     try:
         db_file_path = os.path.join(out_folder, f"{count}-{os.path.basename(tar_file_path)}_file_listing.db")
         with tarfile.open(tar_file_path, mode="r:*") as archive, sqlite3.connect(db_file_path) as conn:
@@ -130,11 +313,21 @@ def process_tar_file(tar_file_path, out_folder, count):
                     accessed_date TEXT,
                     is_file INTEGER,
                     size INTEGER,
-                    comp_size INTEGER
+                    comp_size INTEGER,
+                    detected_type TEXT,
+                    extension_mismatch INTEGER
                 )
             ''')
 
-            for member in archive.getmembers():
+            sniff_entries = []
+            sniff_rows = []
+            # A plain TAR is opened on a raw buffered file; gz/bz2/xz streams are wrapped in a decompressor
+            compressed = not isinstance(archive.fileobj, io.BufferedReader)
+            if sniff and compressed:
+                # Compressed streams can't be seeked randomly, so read each head while the stream is at that member
+                def read_compressed_head(member):
+                    return archive.extractfile(member).read(SIGNATURE_READ_SIZE)
+            for member in archive:
                 entry_path = member.name
                 size = member.size
                 # tar files don't inherently have a compressed size accessible this way
@@ -153,6 +346,26 @@ def process_tar_file(tar_file_path, out_folder, count):
                 cursor.execute("INSERT OR IGNORE INTO file_listing (file_name, file_extension, entry_path, created_date, modified_date, accessed_date, is_file, size, comp_size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
                          (file_name, file_extension, entry_path, created_date, modified_date, accessed_date, is_file, size, comp_size))
 
+                # Only sniff the entry that owns the row; INSERT OR IGNORE keeps the first duplicate
+                if sniff and is_file and size and not member.issparse() and cursor.rowcount == 1:
+                    if compressed:
+                        row = sniff_entry(read_compressed_head, entry_path, file_extension, member)
+                        if row:
+                            sniff_rows.append(row)
+                    else:
+                        sniff_entries.append((entry_path, file_extension, member))
+
+            if sniff_entries:
+                print(f"Sniffing content signatures: {len(sniff_entries)} entries")
+                # Member data sits at a fixed offset, so each worker reads it straight from its own handle
+                def read_head(member):
+                    with open(tar_file_path, 'rb') as f:
+                        f.seek(member.offset_data)
+                        return f.read(min(member.size, SIGNATURE_READ_SIZE))
+                sniff_rows = sniff_signatures(sniff_entries, read_head, workers)
+            if sniff_rows:
+                write_signatures(cursor, sniff_rows)
+
         conn.commit()
         return True
     except FileNotFoundError:
@@ -162,7 +375,7 @@ def process_tar_file(tar_file_path, out_folder, count):
         print(f"'{tar_file_path}' is not a valid TAR file.")
         return False
 
-def check_input(input_path, out_folder):
+def check_input(input_path, out_folder, sniff=False, workers=None):
     global count
     global files_found
 
@@ -184,9 +397,12 @@ def check_input(input_path, out_folder):
                     accessed_date TEXT,
                     is_file INTEGER,
                     size INTEGER,
-                    comp_size INTEGER
+                    comp_size INTEGER,
+                    detected_type TEXT,
+                    extension_mismatch INTEGER
                 )
             ''')
+            sniff_entries = []
             for root, _, files in os.walk(input_path):
                 for file in files:
                     file_path = os.path.join(root, file)
@@ -202,7 +418,11 @@ def check_input(input_path, out_folder):
                             # files_found.append((file_path, os.path.join(out_folder, f"{count}-{os.path.basename(file_path)}_file_listing.db")))
                     # else:
                         # process_file(file_path, cursor)
-                    process_file(file_path, cursor)
+                    if process_file(file_path, cursor) and sniff:
+                        sniff_entries.append((file_path.replace('\\', '/'), os.path.splitext(file)[1], file_path))
+            if sniff_entries:
+                print(f"Sniffing content signatures: {len(sniff_entries)} entries")
+                write_signatures(cursor, sniff_signatures(sniff_entries, read_file_head, workers))
             conn.commit()
             files_found.append((input_path, db_file_path))
             count = 1 # Reset count as we are listing the folder itself
@@ -210,18 +430,18 @@ def check_input(input_path, out_folder):
     # Process if just a zip or tar file for input
     elif zipfile.is_zipfile(input_path):
         print(f"Processing ZIP file: {input_path}")
-        if process_zip_file(input_path, out_folder, 1):
+        if process_zip_file(input_path, out_folder, 1, sniff, workers):
             files_found.append((input_path, os.path.join(out_folder, f"1-{os.path.basename(input_path)}_file_listing.db")))
             count = 1
     elif tarfile.is_tarfile(input_path):
         print(f"Processing TAR file: {input_path}")
-        if process_tar_file(input_path, out_folder, 1):
+        if process_tar_file(input_path, out_folder, 1, sniff, workers):
             files_found.append((input_path, os.path.join(out_folder, f"1-{os.path.basename(input_path)}_file_listing.db")))
             count = 1
     else:
         print("Unknown input type, please make sure your input is a folder containing ZIP/TAR files or a single ZIP/TAR file.")
 
-def main(input_path, export_path):
+def main(input_path, export_path, sniff=False, workers=None):
     global count
     global files_found
 
@@ -254,7 +474,7 @@ def main(input_path, export_path):
     os.makedirs(out_folder, exist_ok=True)
 
     # Check Inputs for Processing
-    check_input(input_path, out_folder)
+    check_input(input_path, out_folder, sniff, workers)
 
     # Write CSV
     with open(os.path.join(out_folder, "io.csv"), 'w', newline='') as csvfile:
@@ -271,6 +491,8 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Arc2Lite v0.0.6 by @KevinPagano3 | @stark4n6 | https://github.com/stark4n6/Arc2Lite")
     parser.add_argument("input_path", help="Path to the ZIP/TAR file or folder for traversing")
     parser.add_argument("export_path", help="Path for the export report")
+    parser.add_argument("-s", "--sniff", action="store_true", help="Read the first bytes of each entry to detect its real file type and flag extension mismatches")
+    parser.add_argument("-w", "--workers", type=positive_int, default=None, help="Number of worker threads used when sniffing (default: based on CPU count)")
     #parser.add_argument("embedded extraction", help="Switch to also get file listings of ZIP/TAR files inside a folder")
     args = parser.parse_args()
-    main(args.input_path, args.export_path)
+    main(args.input_path, args.export_path, args.sniff, args.workers)